@@ -4,22 +4,72 @@ A single-file Flask app that uses **1 GPU** and a small Hugging Face LLM to gene
 short, classroom-safe jokes. Visiting localhost requires providing a topic.
 
 Requirements:
-  pip install flask transformers accelerate torch
+  pip install flask transformers accelerate torch gunicorn orjson
+  pip install flash-attn --no-build-isolation   (optional, enables FlashAttention-2)
+  pip install torchao                           (optional, enables INT8 weights)
 
 Run on a cluster compute node (1 GPU allocated):
-  export FLASK_APP=joker.py
-  flask run --host 0.0.0.0 --port 8000
+  gunicorn -w 1 -k gthread --threads 8 --timeout 600 -b 0.0.0.0:8000 joker:app
+
+  Keep a single worker (-w 1): each worker process loads its own copy of the model.
+  The threads only wait on the batching worker, which owns the GPU. Do not use
+  --preload, the model and its worker thread must be created in the serving process.
+  The long --timeout covers model load + compile warmup at boot.
+
+  For quick debugging the Flask dev server still works:
+    export FLASK_APP=joker.py
+    flask run --host 0.0.0.0 --port 8000
 
 Then tunnel from your laptop:
   ssh -L 8000:<COMPUTE_NODE>:8000 <user>@mahti.csc.fi
 
 Open:
   http://localhost:8000  -> you must enter a topic to get a joke
+  The page streams tokens from /stream?topic=... (Server-Sent Events) as they are generated.
 
 Model choice:
   Default: TinyLlama/TinyLlama-1.1B-Chat-v1.0
   Override:
     export JOKE_MODEL="microsoft/phi-2"   (or another small model)
+
+Attention kernel:
+  Default: PyTorch SDPA (dispatches to its fused flash / mem-efficient kernels)
+  Override:
+    export ATTN_IMPL="flash_attention_2"   (needs flash-attn and a transformers
+                                            release whose FA2 path supports StaticCache)
+
+Weight quantization:
+  Default: INT8 weight-only (bf16 activations) via torchao, if installed.
+  Only pays off together with torch.compile, which fuses dequant + matmul.
+  Only the decode step is compiled, so the prefill of each batch (and the one-off
+  system-turn pass at startup) runs the unfused eager INT8 path, which is slower
+  than bf16. Prompts are a few dozen tokens while decode runs up to MAX_NEW_TOKENS
+  steps, so decode dominates; for long prompts JOKE_QUANT=none may be faster.
+  Disable with:
+    export JOKE_QUANT=none
+
+KV cache:
+  A static KV cache of MAX_PROMPT_TOKENS + MAX_NEW_TOKENS is allocated once per batch
+  size and reused by every request, so the CUDA graphs are captured only once.
+  Topics whose prompt exceeds MAX_PROMPT_TOKENS (default 256) are rejected.
+  The keys/values of the constant system prompt are computed once at startup and
+  copied into the cache for every batch, so only the user turn is prefilled.
+
+Batching:
+  Requests arriving within BATCH_WINDOW_MS (default 20) of each other are generated
+  together, up to MAX_BATCH_SIZE (default 8) prompts per decode loop. Batches are
+  padded up to the next power of two (1/2/4/8), so only those sizes are compiled.
+
+Decoding:
+  A hand-written prefill + decode loop over the static cache (temperature + top-p
+  sampling) replaces model.generate, avoiding its per-step logits-processor overhead.
+  A joke is finished at EOS, at its first blank line, or once it exceeds the
+  400 characters the prompt asks for; MAX_NEW_TOKENS (default 120) is only a cap.
+
+torch.compile:
+  The decode step is compiled (Inductor, CUDA graphs) and warmed up at startup for
+  every padded batch size, which adds some seconds to the load time. Disable with:
+    export JOKE_COMPILE=0
 """
 
 import os
@@ -36,81 +86,422 @@ os.environ["HUGGINGFACE_HUB_CACHE"] = str(HF_CACHE)
 
 print(f"[HF cache dir] {HF_CACHE}")
 
+import functools
+import queue
+import threading
 import time
-from flask import Flask, request, render_template_string
+from concurrent.futures import Future
+from flask import Flask, Response, request
+import orjson
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    DynamicCache,
+    StaticCache,
+    TextIteratorStreamer,
+)
 
 # -----------------------
 # Config
 # -----------------------
 MODEL_NAME = os.environ.get("JOKE_MODEL", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
-MAX_NEW_TOKENS = int(os.environ.get("MAX_NEW_TOKENS", "300"))
+MAX_NEW_TOKENS = int(os.environ.get("MAX_NEW_TOKENS", "120"))
+MAX_JOKE_CHARS = 400  # matches the limit stated in SYSTEM_PROMPT
+MAX_PROMPT_TOKENS = int(os.environ.get("MAX_PROMPT_TOKENS", "256"))
 TEMPERATURE = float(os.environ.get("TEMPERATURE", "0.9"))
 TOP_P = float(os.environ.get("TOP_P", "0.95"))
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "20"))
+# Batches are padded up to one of these sizes, so only these shapes get compiled and captured
+BATCH_SIZES = sorted({min(2**i, MAX_BATCH_SIZE) for i in range(MAX_BATCH_SIZE.bit_length() + 1)})
+
+# SDPA fuses Q·Kᵀ -> softmax -> ·V into one tiled kernel and works with the static cache.
+ATTN_IMPL = os.environ.get("ATTN_IMPL", "sdpa")
+COMPILE = os.environ.get("JOKE_COMPILE", "1") == "1"
+QUANT = os.environ.get("JOKE_QUANT", "int8")
 
 # Force single GPU usage (cuda:0)
 if not torch.cuda.is_available():
     raise RuntimeError("CUDA GPU not available. Allocate 1 GPU and run on a compute node.")
 torch.cuda.set_device(0)
 DEVICE = torch.device("cuda:0")
+# All work here is inference: no autograd bookkeeping anywhere in the main thread
+torch.set_grad_enabled(False)
+# Stream the batching worker generates on; it is ordered after the load-time work before use
+GEN_STREAM = torch.cuda.Stream(DEVICE)
+
+# Any matmul / conv left in fp32 may use TF32 tensor cores (Ampere+)
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
 
 # -----------------------
 # Load model once at startup
 # -----------------------
 _load_t0 = time.time()
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+# Batched prompts are padded so every row ends right where generation starts
+if tokenizer.pad_token is None:
+    tokenizer.pad_token = tokenizer.eos_token
 model = AutoModelForCausalLM.from_pretrained(
     MODEL_NAME,
-    torch_dtype=torch.float16,
+    # bf16: same tensor-core throughput as fp16, but no overflow in softmax/attention
+    torch_dtype=torch.bfloat16,
     low_cpu_mem_usage=True,
+    attn_implementation=ATTN_IMPL,
 ).to(DEVICE)
 model.eval()
-torch.cuda.synchronize()
-LOAD_SECONDS = time.time() - _load_t0
+
+# Decode at bs=1 is bound by reading weights from HBM; INT8 weights halve those bytes.
+# Without torch.compile the dequant and matmul run as two kernels and are slower than bf16;
+# that is also what the eager prefill pays (see "Weight quantization" above).
+if QUANT == "int8" and COMPILE:
+    try:
+        from torchao.quantization import quantize_, int8_weight_only
+    except ImportError:
+        print("[quant] torchao not installed, keeping bf16 weights")
+    else:
+        quantize_(model, int8_weight_only())
+        print("[quant] INT8 weight-only")
+
+MAX_CACHE_LEN = MAX_PROMPT_TOKENS + MAX_NEW_TOKENS
+
+# Chat-style prompt for TinyLlama; works decently for many chat-tuned small models.
+# The system turn never changes, so it is prefilled once here and reused by every request.
+SYSTEM_PROMPT = (
+    "<|system|>\n"
+    "You are a witty comedian. Tell short, clean jokes suitable for a classroom.\n"
+    "Keep it to less than 400 characters. Avoid offensive content.\n"
+)
+SYSTEM_IDS = tokenizer(SYSTEM_PROMPT).input_ids
+with torch.inference_mode():
+    _system_cache = DynamicCache()
+    model(input_ids=torch.tensor([SYSTEM_IDS], device=DEVICE), past_key_values=_system_cache, use_cache=True)
+    SYSTEM_KV = [_system_cache[layer_idx] for layer_idx in range(len(_system_cache))]
+del _system_cache
+
+# bs=1 decode is dominated by kernel launch overhead; Inductor fuses the small
+# pointwise kernels and "reduce-overhead" replays each step as a CUDA graph.
+# Only the decode step is compiled: its shapes are fixed per batch size, whereas the
+# prefill length changes with every prompt and would keep recapturing graphs.
+if COMPILE:
+    import torch._inductor.config
+    torch._inductor.config.triton.cudagraphs = True
+    decode_forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False, backend="inductor")
+else:
+    decode_forward = model.forward
 
 
 def build_prompt(topic: str) -> str:
-    # Chat-style prompt for TinyLlama; works decently for many chat-tuned small models.
     return (
-        "<|system|>\n"
-        "You are a witty comedian. Tell short, clean jokes suitable for a classroom.\n"
-        "Keep it to less than 400 characters. Avoid offensive content.\n"
-        "<|user|>\n"
+        SYSTEM_PROMPT
+        + "<|user|>\n"
         f"Tell me a joke about: {topic}\n"
         "<|assistant|>\n"
     )
 
 
-@torch.inference_mode()
-def generate_joke(topic: str) -> str:
+@functools.lru_cache(maxsize=512)
+def _suffix_ids(topic: str) -> tuple[int, ...]:
+    # Token ids of the prompt after the system turn, memoized since demo users repeat topics.
+    # Tokenizing the full prompt keeps the ids identical to an unsplit prompt whenever the
+    # system turn is a clean token prefix (a lone user turn would get a leading-space token).
     prompt = build_prompt(topic)
-    inputs = tokenizer(prompt, return_tensors="pt").to(DEVICE)
-
-    out = model.generate(
-        **inputs,
-        max_new_tokens=MAX_NEW_TOKENS,
-        do_sample=True,
-        temperature=TEMPERATURE,
-        top_p=TOP_P,
-        pad_token_id=tokenizer.eos_token_id,
-        eos_token_id=tokenizer.eos_token_id,
+    ids = tokenizer(prompt).input_ids
+    if ids[: len(SYSTEM_IDS)] == SYSTEM_IDS:
+        return tuple(ids[len(SYSTEM_IDS):])
+    return tuple(tokenizer(prompt[len(SYSTEM_PROMPT):], add_special_tokens=False).input_ids)
+
+
+@functools.lru_cache(maxsize=None)
+def _static_cache(batch_size: int) -> StaticCache:
+    # Fixed-shape KV cache: allocated once per batch size, reset between batches. Keeping
+    # the tensor addresses stable is what lets the compiled decode step be replayed as a CUDA graph.
+    return StaticCache(
+        config=model.config,
+        max_batch_size=batch_size,
+        max_cache_len=MAX_CACHE_LEN,
+        device=DEVICE,
+        dtype=model.dtype,
     )
 
-    text = tokenizer.decode(out[0], skip_special_tokens=False)
 
-    # Extract assistant answer after the last "<|assistant|>"
-    marker = "<|assistant|>"
-    if marker in text:
-        answer = text.split(marker)[-1]
-    else:
-        answer = text
+# Pinned host staging buffers for the prompt ids / mask, so the copy to the GPU is an async DMA.
+# Flat, so any (batch, length) view of the front stays contiguous. _STAGING_COPIED is recorded
+# after the copies and waited on before the buffers are written again, even if the batch failed.
+_PINNED_IDS = torch.empty(MAX_BATCH_SIZE * MAX_PROMPT_TOKENS, dtype=torch.long, pin_memory=True)
+_PINNED_MASK = torch.empty(MAX_BATCH_SIZE * MAX_PROMPT_TOKENS, dtype=torch.long, pin_memory=True)
+_STAGING_COPIED = torch.cuda.Event()
+
+
+def _restore_system_kv(cache: StaticCache, batch_size: int):
+    # Write the precomputed system-turn keys/values into positions [0, len(SYSTEM_IDS))
+    positions = torch.arange(len(SYSTEM_IDS), device=DEVICE)
+    for layer_idx, (keys, values) in enumerate(SYSTEM_KV):
+        cache.update(
+            keys.expand(batch_size, -1, -1, -1),
+            values.expand(batch_size, -1, -1, -1),
+            layer_idx,
+            {"cache_position": positions},
+        )
+
+
+def _sample(logits: torch.Tensor) -> torch.Tensor:
+    # Temperature + nucleus (top-p) sampling over the last-position logits, shape (batch, vocab)
+    probs = torch.softmax(logits.float() / TEMPERATURE, dim=-1)
+    sorted_probs, sorted_idx = probs.sort(dim=-1, descending=True)
+    # Drop a token once the mass ranked above it already reaches TOP_P (keeps at least one)
+    sorted_probs[sorted_probs.cumsum(dim=-1) - sorted_probs >= TOP_P] = 0
+    choice = torch.multinomial(sorted_probs, num_samples=1)
+    return sorted_idx.gather(-1, choice).squeeze(-1)
+
+
+# Text each token id adds to a row, so stopping can follow the rows without re-decoding them.
+# Decoded after an anchor token: SentencePiece drops a token's leading space at the start of a text.
+_ANCHOR_ID = tokenizer("\n", add_special_tokens=False).input_ids[-1]
+_ANCHOR_TEXT = tokenizer.decode([_ANCHOR_ID])
+_TOKEN_TEXT = [
+    text[len(_ANCHOR_TEXT):]
+    for text in tokenizer.batch_decode(
+        [[_ANCHOR_ID, token_id] for token_id in range(len(tokenizer))], skip_special_tokens=True
+    )
+]
+
+
+class JokeStopper:
+    """Follows each row's joke on the host: done once over max_chars, or at a blank line after some text."""
+
+    def __init__(self, batch_size: int, max_chars: int):
+        self.max_chars = max_chars
+        self.chars = [0] * batch_size
+        self.newlines = [0] * batch_size  # consecutive "\n" at the end of the row's text
+        self.has_text = [False] * batch_size
+
+    def update(self, row: int, token_id: int) -> bool:
+        piece = _TOKEN_TEXT[token_id]
+        self.chars[row] += len(piece)
+        for ch in piece:
+            if ch == "\n":
+                self.newlines[row] += 1
+                if self.newlines[row] >= 2 and self.has_text[row]:
+                    return True
+            else:
+                self.newlines[row] = 0
+                self.has_text[row] = self.has_text[row] or not ch.isspace()
+        return self.chars[row] > self.max_chars
+
+
+def _generate_batch(batch_suffix_ids: list[tuple[int, ...]], streamers: list) -> list[str]:
+    # Layout per row: [system turn | left padding | user turn]. The system turn sits at the
+    # same positions in every row, so its cached keys/values are valid for all of them.
+    # Filler rows (copies of the first one) round the batch up to a warmed-up size.
+    num_rows = len(batch_suffix_ids)
+    batch_size = next(size for size in BATCH_SIZES if size >= num_rows)
+    batch_suffix_ids = batch_suffix_ids + [batch_suffix_ids[0]] * (batch_size - num_rows)
+    streamers = streamers + [None] * (batch_size - num_rows)
+    suffix_len = max(len(ids) for ids in batch_suffix_ids)
+    # Only the user turn goes to the GPU: the system turn is represented by its cached KV
+    staged_ids = _PINNED_IDS[: batch_size * suffix_len].view(batch_size, suffix_len)
+    staged_mask = _PINNED_MASK[: batch_size * suffix_len].view(batch_size, suffix_len)
+    ids_np, mask_np = staged_ids.numpy(), staged_mask.numpy()
+    _STAGING_COPIED.synchronize()  # returns at once if never recorded
+    for row, ids in enumerate(batch_suffix_ids):
+        pad = suffix_len - len(ids)
+        ids_np[row, :pad] = tokenizer.pad_token_id
+        ids_np[row, pad:] = ids
+        mask_np[row, :pad] = 0
+        mask_np[row, pad:] = 1
+
+    input_ids = staged_ids.to(DEVICE, non_blocking=True)
+    attention_mask = staged_mask.to(DEVICE, non_blocking=True)
+    _STAGING_COPIED.record()
+    system_len = len(SYSTEM_IDS)
+    prompt_len = system_len + suffix_len
+
+    cache = _static_cache(batch_size)
+    cache.reset()
+    _restore_system_kv(cache, batch_size)
+
+    # The mask always spans the whole cache, so every decode step sees the same shapes
+    mask = torch.zeros((batch_size, MAX_CACHE_LEN), dtype=torch.long, device=DEVICE)
+    mask[:, :system_len] = 1
+    mask[:, system_len:prompt_len] = attention_mask
+    # Padding does not take a position: the user turn continues right after the system turn
+    position_ids = system_len + attention_mask.cumsum(-1) - 1
+
+    # Prefill only the user turn; the system turn is already in the cache
+    logits = model(
+        input_ids=input_ids,
+        attention_mask=mask,
+        position_ids=position_ids,
+        cache_position=torch.arange(system_len, prompt_len, device=DEVICE),
+        past_key_values=cache,
+        use_cache=True,
+    ).logits[:, -1]
+
+    next_tokens = _sample(logits)
+    next_positions = position_ids[:, -1:] + 1
+    stopper = JokeStopper(batch_size, MAX_JOKE_CHARS)
+    # Finished rows: on the host for the bookkeeping, on the GPU to pad their next tokens
+    done = [row >= num_rows for row in range(batch_size)]
+    finished = torch.tensor(done, dtype=torch.bool, device=DEVICE)
+    generated = []
+    for step in range(1, MAX_NEW_TOKENS + 1):
+        generated.append(next_tokens)
+        newly_done = []
+        # The one host sync per step
+        for row, token_id in enumerate(next_tokens.tolist()):
+            if done[row]:
+                continue
+            if token_id == tokenizer.eos_token_id:
+                newly_done.append(row)
+                continue
+            if streamers[row] is not None:
+                streamers[row].put(torch.tensor([token_id]))
+            if stopper.update(row, token_id):
+                newly_done.append(row)
+        if newly_done:
+            for row in newly_done:
+                done[row] = True
+            finished[newly_done] = True
+        if all(done) or step == MAX_NEW_TOKENS:
+            break
+
+        slot = prompt_len + step - 1
+        mask[:, slot] = 1
+        logits = decode_forward(
+            input_ids=next_tokens[:, None],
+            attention_mask=mask,
+            position_ids=next_positions,
+            cache_position=torch.tensor([slot], device=DEVICE),
+            past_key_values=cache,
+            use_cache=True,
+        ).logits[:, -1]
+
+        next_tokens = torch.where(finished, tokenizer.pad_token_id, _sample(logits))
+        next_positions = next_positions + 1
+
+    # Only generated tokens are decoded, so there is no prompt to split off; EOS and the
+    # padding after a finished row are special tokens and get skipped by the tokenizer.
+    texts = tokenizer.batch_decode(torch.stack(generated, dim=1).tolist(), skip_special_tokens=True)
+    # A row can stop on the very token that opened its blank line
+    return [text.strip().partition("\n\n")[0].rstrip() for text in texts[:num_rows]]
 
-    answer = answer.replace("<|endoftext|>", "").strip()
-    if "\n\n" in answer:
-        answer = answer.split("\n\n")[0].strip()
 
-    return answer
+# -----------------------
+# Batching worker: the only thread that touches the GPU
+# -----------------------
+_requests: queue.Queue = queue.Queue()
+# Resolved by the worker once its warmup is done (or failed)
+_worker_ready = Future()
+
+
+def _warmup():
+    # Compile and capture the decode step for every batch size on the thread that replays it,
+    # so no live batch pays a recompile or CUDA-graph capture
+    warmup_ids = _suffix_ids("warmup")
+    for batch_size in BATCH_SIZES:
+        _generate_batch([warmup_ids] * batch_size, [None] * batch_size)
+
+
+def _batch_worker():
+    # Decode is bound by reading the weights, so one batched decode step costs about
+    # the same as a single prompt; collect whatever arrives within the window.
+    # Inference mode and the generation stream are entered once, for the worker's lifetime.
+    # Grad mode is thread-local, so the global set_grad_enabled(False) does not cover this thread.
+    with torch.inference_mode(), torch.cuda.stream(GEN_STREAM):
+        try:
+            if COMPILE:
+                _warmup()
+        except Exception as e:
+            _worker_ready.set_exception(e)
+            return
+        _worker_ready.set_result(None)
+
+        while True:
+            batch = [_requests.get()]
+            deadline = time.monotonic() + BATCH_WINDOW_MS / 1000
+            while len(batch) < MAX_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(_requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                answers = _generate_batch(
+                    [suffix_ids for suffix_ids, _, _ in batch],
+                    [streamer for _, _, streamer in batch],
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), answer in zip(batch, answers):
+                    future.set_result(answer)
+            finally:
+                for _, _, streamer in batch:
+                    if streamer is not None:
+                        streamer.end()
+
+
+# Weights and system KV were prepared on the default stream; order the worker's stream after them
+GEN_STREAM.wait_stream(torch.cuda.current_stream())
+threading.Thread(target=_batch_worker, name="joke-batcher", daemon=True).start()
+
+
+class TopicTooLong(ValueError):
+    """The topic's prompt does not fit in MAX_PROMPT_TOKENS; a client error, unlike generation failures."""
+
+
+def _submit(topic: str, streamer: TextIteratorStreamer | None = None) -> Future:
+    suffix_ids = _suffix_ids(topic)
+    if len(SYSTEM_IDS) + len(suffix_ids) > MAX_PROMPT_TOKENS:
+        raise TopicTooLong("Topic is too long. Please use a shorter topic.")
+
+    future = Future()
+    _requests.put((suffix_ids, future, streamer))
+    return future
+
+
+def generate_joke(topic: str) -> str:
+    return _submit(topic).result()
+
+
+def stream_joke(topic: str) -> tuple[TextIteratorStreamer, Future]:
+    # Iterating the streamer yields decoded text as soon as the worker produces tokens.
+    # The worker resolves the future before it ends the streamer, so it can be checked afterwards.
+    streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True)
+    future = _submit(topic, streamer)
+    return streamer, future
+
+
+def _trim_stream(chunks):
+    # Yields the same text generate_joke() returns: stripped, and cut at the first blank line.
+    # Trailing whitespace is held back until more text follows it.
+    held = ""
+    started = False
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        chunk, blank_line, _ = (held + chunk).partition("\n\n")
+        text = chunk.rstrip()
+        held = chunk[len(text):]
+        if text:
+            yield text
+        if blank_line:
+            return
+
+
+# Pay the compile cost at startup instead of on the first real request
+_worker_ready.result()
+torch.cuda.synchronize()
+LOAD_SECONDS = time.time() - _load_t0
 
 # -----------------------
 # Flask app
@@ -151,74 +542,165 @@ PAGE = """
     {% endif %}
 
     {% if joke %}
-      <hr>
-      <p><b>Joke ({{ latency }}s):</b></p>
-      <pre>{{ joke }}</pre>
+      <div id="result">
+        <hr>
+        <p><b>Joke ({{ latency }}s):</b></p>
+        <pre>{{ joke }}</pre>
+      </div>
     {% endif %}
+
+    <div id="stream-box" hidden>
+      <hr>
+      <p><b>Joke:</b></p>
+      <pre id="stream"></pre>
+    </div>
   </div>
 
   <p class="muted">
-    Tip: You can also call <code>/joke?topic=...</code> to get JSON.
+    Tip: You can also call <code>/joke?topic=...</code> to get JSON,
+    or <code>/stream?topic=...</code> for Server-Sent Events.
   </p>
+
+  <script>
+    // Stream the joke token by token; without EventSource the form falls back to a full page load
+    const form = document.querySelector("form");
+    const streamBox = document.getElementById("stream-box");
+
+    function showError(message) {
+      const p = document.createElement("p");
+      p.className = "err";
+      p.appendChild(document.createElement("b")).textContent = message;
+      streamBox.hidden = true;
+      streamBox.before(p);
+    }
+
+    form.addEventListener("submit", (event) => {
+      const topic = document.getElementById("topic").value.trim();
+      if (!window.EventSource || !topic) return;
+      event.preventDefault();
+
+      document.querySelectorAll(".err, #result").forEach((el) => el.remove());
+      const out = document.getElementById("stream");
+      out.textContent = "";
+      streamBox.hidden = false;
+
+      let received = false;
+      const source = new EventSource("/stream?topic=" + encodeURIComponent(topic));
+      source.onmessage = (e) => { received = true; out.textContent += e.data; };
+      source.addEventListener("done", () => source.close());
+      source.addEventListener("joke-error", (e) => { source.close(); showError(e.data); });
+      source.onerror = () => {
+        source.close();
+        // An HTTP error (e.g. topic too long) has a body EventSource cannot read:
+        // submit the form normally so the server renders the error page
+        if (received) showError("Connection lost while streaming the joke.");
+        else form.submit();
+      };
+    });
+  </script>
 </body>
 </html>
 """
+# Parse and compile the template once instead of on every request
+_TEMPLATE = app.jinja_env.from_string(PAGE)
 
 
-@app.route("/", methods=["GET"])
-def home():
-    topic = (request.args.get("topic") or "").strip()
+DEVICE_NAME = torch.cuda.get_device_name(0)
 
-    if not topic:
-        # Require a topic: show form, no joke yet
-        return render_template_string(
-            PAGE,
-            model_name=MODEL_NAME,
-            device_name=torch.cuda.get_device_name(0),
-            load_seconds=f"{LOAD_SECONDS:.2f}",
-            topic="",
-            joke="",
-            latency="",
-            error="Please enter a topic to generate a joke.",
-        )
-
-    t0 = time.time()
-    joke = generate_joke(topic)
-    torch.cuda.synchronize()
-    latency = time.time() - t0
 
-    return render_template_string(
-        PAGE,
+def _render_page(topic: str = "", joke: str = "", latency: str = "", error: str = "") -> str:
+    return _TEMPLATE.render(
         model_name=MODEL_NAME,
-        device_name=torch.cuda.get_device_name(0),
+        device_name=DEVICE_NAME,
         load_seconds=f"{LOAD_SECONDS:.2f}",
         topic=topic,
         joke=joke,
-        latency=f"{latency:.2f}",
-        error="",
+        latency=latency,
+        error=error,
     )
 
 
+# The bare form (no topic yet) is the most common hit and never changes: render it once
+EMPTY_PAGE_HTML = _render_page(error="Please enter a topic to generate a joke.")
+
+
+def _topic_arg() -> str:
+    return (request.args.get("topic") or "").strip()
+
+
+def _json(payload: dict, status: int = 200) -> Response:
+    # orjson encodes straight to bytes in C, skipping Flask's stdlib-json provider
+    return app.response_class(orjson.dumps(payload), status=status, mimetype="application/json")
+
+
+def _timed_joke(topic: str) -> tuple[str, float]:
+    t0 = time.time()
+    joke = generate_joke(topic)
+    return joke, time.time() - t0
+
+
+@app.route("/", methods=["GET"])
+def home():
+    topic = _topic_arg()
+    if not topic:
+        # Require a topic: show form, no joke yet
+        return EMPTY_PAGE_HTML
+
+    try:
+        joke, latency = _timed_joke(topic)
+    except TopicTooLong as e:
+        return _render_page(topic=topic, error=str(e)), 400
+
+    return _render_page(topic=topic, joke=joke, latency=f"{latency:.2f}")
+
+
 @app.route("/joke", methods=["GET"])
 def joke_api():
-    topic = (request.args.get("topic") or "").strip()
+    topic = _topic_arg()
     if not topic:
-        return {"error": "Missing required query parameter: topic"}, 400
+        return _json({"error": "Missing required query parameter: topic"}, 400)
 
-    t0 = time.time()
-    joke = generate_joke(topic)
-    torch.cuda.synchronize()
-    latency = time.time() - t0
+    try:
+        joke, latency = _timed_joke(topic)
+    except TopicTooLong as e:
+        return _json({"error": str(e)}, 400)
 
-    return {
+    return _json({
         "topic": topic,
         "joke": joke,
         "model": MODEL_NAME,
-        "device": torch.cuda.get_device_name(0),
+        "device": DEVICE_NAME,
         "latency_seconds": round(latency, 3),
-    }
+    })
+
+
+@app.route("/stream", methods=["GET"])
+def joke_stream():
+    topic = _topic_arg()
+    if not topic:
+        return _json({"error": "Missing required query parameter: topic"}, 400)
+
+    try:
+        chunks, future = stream_joke(topic)
+    except TopicTooLong as e:
+        return _json({"error": str(e)}, 400)
+
+    def events():
+        for text in _trim_stream(chunks):
+            # One "data:" line per text line; EventSource joins them back with "\n"
+            yield "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
+
+        # Stopping early at a blank line means the joke is complete, whatever the rest of the batch does
+        error = future.exception() if future.done() else None
+        if error is not None:
+            app.logger.error("Joke generation failed for topic %r", topic, exc_info=error)
+            yield "event: joke-error\ndata: Joke generation failed. Please try again.\n\n"
+        else:
+            yield "event: done\ndata: \n\n"
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 if __name__ == "__main__":
-    # Local quick run (will still require GPU)
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", "8000")), debug=True)
+    # Local quick run (will still require GPU). No debug reloader: it would load the model twice.
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", "8000")), threaded=True)
@@ -1,4 +1,5 @@
 from flask import Flask, render_template, request
+from markupsafe import Markup, escape
 import random
 
 # Initialize Flask app
@@ -65,26 +66,25 @@ def show_user(username):
     """Greet the user based on the URL parameter"""
     return f'Hello, {username}!'
 
-with open("templates/random_generator.html", "r") as file:
-    html_template = file.read()
-    
 # 6. Random order generator of unordered list
 @app.route("/shuffle", methods=["GET"])
 def shuffle_names():
     shuffled_names_html = ""
 
     names = request.args.get("names", "")
-    
-    if names != "":
-        name_list = [name.strip() for name in names.split(",") if name.strip()]
+    name_list = [name.strip() for name in names.split(",") if name.strip()]
+
+    if name_list:
         random.shuffle(name_list)
-        shuffled_names_html = "<h2>🔀 Shuffled Order 🔀</h2><ul>"
-        shuffled_names_html += "".join(f"<li>{name}</li>" for name in name_list)
-        shuffled_names_html += "</ul>"
-    
-    print(shuffled_names_html)
-    
-    return html_template.replace("{{ shuffled_names }}", shuffled_names_html)
+        # Names are user input: escape each one before putting it in our HTML
+        shuffled_names_html = (
+            "<h2>🔀 Shuffled Order 🔀</h2><ul>"
+            + "".join("<li>%s</li>" % escape(name) for name in name_list)
+            + "</ul>"
+        )
+
+    # Markup: the list is HTML we built ourselves, so Jinja must not escape it
+    return render_template("random_generator.html", shuffled_names=Markup(shuffled_names_html))
 
 # Running the Flask App
 if __name__ == "__main__":